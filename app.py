@@ -1,16 +1,35 @@
+import time
+
+# Startup timeline, reported by /healthz
+startup_began = time.perf_counter()
+startup_timeline = []
+
+def mark_startup(phase):
+    startup_timeline.append((phase, round(time.perf_counter() - startup_began, 3)))
+
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 from dash import Dash, html, dcc, Input, Output, callback, dash_table, State, ctx
 import base64
-import io
 from dash.exceptions import PreventUpdate
 import random
 import string
+import os
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from geocode import enrich_coordinates, split_location
+
+mark_startup('imports')
 
 # Read the data
 df = pd.read_excel('Complete_Hospital_Locations_and_Sizes.xlsx')
 
+# Fill in coordinates missing from the sheet so those rows still show on the map
+enrich_coordinates(df)
+
 # Process the data
 # Fill missing size categories with 'N/A'
 df['Size Category'] = df['Size Category'].fillna('N/A')
@@ -43,6 +62,41 @@ other_count = specialty_counts[5:].sum() if len(specialty_counts) > 5 else 0
 unique_specialties = sorted(df['Primary Specialty'].unique())
 unique_sizes = sorted(df['Size Category'].unique())
 
+# Build the rollup cube
+# One cell per State x Location x Size Category x Primary Specialty holding the
+# hospital count and bed totals, so Analytics aggregates cells instead of rows.
+# Each Location is a city; its state comes from split_location.
+def extract_state(location):
+    return split_location(location)[0]
+
+cube_dimensions = ['State', 'Location', 'Size Category', 'Primary Specialty']
+cube_measures = ['Count', 'Beds Count', 'Total Beds']
+
+# Parse each distinct Location once rather than once per row
+location_states = {location: extract_state(location) for location in df['Location'].unique()}
+
+rollup_cube = (
+    df.assign(State=df['Location'].map(location_states))
+    .groupby(cube_dimensions, dropna=False)['Estimated Beds']
+    .agg(['size', 'count', 'sum'])
+    .reset_index()
+)
+rollup_cube.columns = cube_dimensions + cube_measures
+
+unique_states = sorted(rollup_cube['State'].unique())
+
+# Answer a slice of the cube, e.g. rollup('Location', {'State': 'OHIO'})
+def rollup(by, filters=None):
+    cells = rollup_cube
+    for dimension, value in (filters or {}).items():
+        if value:
+            cells = cells[cells[dimension] == value]
+
+    result = cells.groupby(by)[cube_measures].sum().reset_index()
+    # Mean over hospitals with a bed estimate, matching df['Estimated Beds'].mean()
+    result['Mean Beds'] = result['Total Beds'] / result['Beds Count'].where(result['Beds Count'] > 0)
+    return result
+
 # Generate a random letter for each hospital (for company card display)
 def random_letter():
     return random.choice(string.ascii_uppercase)
@@ -53,6 +107,72 @@ df['Initial'] = [random_letter() for _ in range(len(df))]
 with open('_eo_scale_yourself.png', 'rb') as image_file:
     encoded_logo = base64.b64encode(image_file.read()).decode('ascii')
 
+mark_startup('data')
+
+# Figure rendering mode
+# With FIGURE_WORKERS > 0 the per-request Plotly figures are built in a forked
+# process pool, so concurrent users on one gunicorn worker don't queue behind
+# the GIL. Forked workers inherit df read-only through copy-on-write. The pool
+# returns plain figure dicts; Dash still JSON-encodes the response in the
+# request thread.
+FIGURE_WORKERS = int(os.environ.get('FIGURE_WORKERS', '0'))
+_figure_pool = None
+_figure_pool_pid = None
+_figure_pool_lock = threading.Lock()
+
+def get_figure_pool():
+    global _figure_pool, _figure_pool_pid
+    # A pool created in another process (e.g. a preloading gunicorn master)
+    # is not usable after fork, so each process builds its own. Under gunicorn
+    # this happens in post_worker_init (see gunicorn.conf.py), before any
+    # request threads exist; the lock covers other servers creating it lazily.
+    with _figure_pool_lock:
+        if _figure_pool is None or _figure_pool_pid != os.getpid():
+            pool = ProcessPoolExecutor(max_workers=FIGURE_WORKERS,
+                                       mp_context=multiprocessing.get_context('fork'))
+            # The fork context starts all pool processes on the first submit,
+            # so do that now rather than from a request thread
+            pool.submit(int).result()
+            _figure_pool, _figure_pool_pid = pool, os.getpid()
+    return _figure_pool
+
+# Drop a pool that lost a process (e.g. to the OOM killer) so the next
+# request builds a fresh one instead of failing until the worker restarts
+def discard_figure_pool(pool):
+    global _figure_pool
+    with _figure_pool_lock:
+        if _figure_pool is pool:
+            _figure_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+# A figure being built in the pool. If the pool breaks before the figure is
+# done, it is discarded and this request builds the figure in-process.
+class PooledFigure:
+    def __init__(self, pool, builder, args):
+        self.pool = pool
+        self.builder = builder
+        self.args = args
+        try:
+            self.future = pool.submit(builder, *args)
+        except BrokenProcessPool:
+            self.future = None
+
+    def result(self):
+        try:
+            if self.future is not None:
+                return self.future.result()
+        except BrokenProcessPool:
+            pass
+        discard_figure_pool(self.pool)
+        return self.builder(*self.args)
+
+def submit_figure(builder, *args):
+    if FIGURE_WORKERS <= 0:
+        future = Future()
+        future.set_result(builder(*args))
+        return future
+    return PooledFigure(get_figure_pool(), builder, args)
+
 # Initialize the Dash app
 app = Dash(__name__, title='eo  Dashboard', 
 suppress_callback_exceptions=True)
@@ -138,6 +258,8 @@ app.layout = html.Div([
     ])
 ])
 
+mark_startup('layout')
+
 # Callback to update active link style
 @app.callback(
     [Output('summary-link', 'style'),
@@ -210,6 +332,163 @@ def render_page_content(page):
         return render_table_page()
     return render_summary_page()  # Default
 
+# Figure builders
+# These run either in-process or in the figure pool, so they take only
+# picklable arguments and return the figure as a plain dict
+def build_size_figure():
+    return px.bar(
+        x=['Small', 'Medium', 'Large', 'N/A'],
+        y=[small_count, medium_count, large_count, na_count],
+        labels={'x': 'Size Category', 'y': 'Number of Hospitals'},
+        color_discrete_sequence=['#4e73df', '#1cc88a', '#36b9cc', '#f6c23e']
+    ).update_layout(
+        margin=dict(l=40, r=40, t=40, b=40),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        height=400
+    ).to_dict()
+
+def build_specialty_figure():
+    return px.pie(
+        values=list(top_specialties) + [other_count],
+        names=list(top_specialties.index) + ['Other'],
+        hole=0.4,
+        color_discrete_sequence=['#4e73df', '#1cc88a', '#36b9cc', '#f6c23e', '#e74a3b', '#f8f9fa']
+    ).update_layout(
+        margin=dict(l=40, r=40, t=40, b=40),
+        paper_bgcolor='white',
+        height=400
+    ).to_dict()
+
+def build_beds_by_size_figure():
+    beds_by_size = rollup('Size Category')
+    beds_by_size = beds_by_size.sort_values('Mean Beds', ascending=False)
+
+    return px.bar(
+        beds_by_size,
+        x='Size Category',
+        y='Mean Beds',
+        color='Size Category',
+        labels={'Mean Beds': 'Average Number of Beds'},
+        color_discrete_map={
+            'Small': '#1cc88a',
+            'Medium': '#4e73df',
+            'Large': '#e74a3b',
+            'N/A': '#f6c23e'
+        }
+    ).update_layout(
+        margin=dict(l=40, r=40, t=40, b=40),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        height=400
+    ).to_dict()
+
+def build_top_locations_figure():
+    top_locations = rollup('Location').nlargest(10, 'Count')
+
+    return px.bar(
+        top_locations,
+        x='Count',
+        y='Location',
+        orientation='h',
+        color_discrete_sequence=['#4e73df']
+    ).update_layout(
+        margin=dict(l=40, r=40, t=40, b=40),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        height=400,
+        yaxis={'categoryorder': 'total ascending'}
+    ).to_dict()
+
+def build_location_drilldown_figure(selected_state, selected_size):
+    # Drill from states down to the cities of the selected state
+    level = 'Location' if selected_state else 'State'
+    counts = rollup([level, 'Size Category'],
+                    {'State': selected_state, 'Size Category': selected_size})
+    top_members = counts.groupby(level)['Count'].sum().nlargest(15).index
+    counts = counts[counts[level].isin(top_members)]
+
+    return px.bar(
+        counts,
+        x='Count',
+        y=level,
+        color='Size Category',
+        orientation='h',
+        hover_data=['Total Beds', 'Mean Beds'],
+        labels={'Count': 'Number of Hospitals'},
+        color_discrete_map={
+            'Small': '#1cc88a',
+            'Medium': '#4e73df',
+            'Large': '#e74a3b',
+            'N/A': '#f6c23e'
+        }
+    ).update_layout(
+        margin=dict(l=40, r=40, t=40, b=40),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        height=500,
+        barmode='stack',
+        yaxis={'categoryorder': 'total ascending'}
+    ).to_dict()
+
+def build_specialty_drilldown_figure(selected_state, selected_size):
+    specialties = rollup('Primary Specialty',
+                         {'State': selected_state, 'Size Category': selected_size})
+    specialties = specialties.nlargest(10, 'Count')
+
+    return px.bar(
+        specialties,
+        x='Count',
+        y='Primary Specialty',
+        color='Mean Beds',
+        orientation='h',
+        hover_data=['Total Beds'],
+        labels={'Count': 'Number of Hospitals', 'Mean Beds': 'Average Beds'},
+        color_continuous_scale=['#36b9cc', '#4e73df']
+    ).update_layout(
+        margin=dict(l=40, r=40, t=40, b=40),
+        paper_bgcolor='white',
+        plot_bgcolor='white',
+        height=500,
+        yaxis={'categoryorder': 'total ascending'}
+    ).to_dict()
+
+def build_map_figure(filter_type, selected_size, selected_specialty):
+    filtered_df = df.copy()
+
+    if filter_type == 'size' and selected_size:
+        filtered_df = filtered_df[filtered_df['Size Category'] == selected_size]
+    elif filter_type == 'specialty' and selected_specialty:
+        filtered_df = filtered_df[filtered_df['Primary Specialty'] == selected_specialty]
+
+    fig = px.scatter_map(
+        filtered_df,
+        lat='Latitude',
+        lon='Longitude',
+        color='Size Category',
+        hover_name='Hospital/Organization',
+        hover_data=['Location', 'Estimated Beds', 'Primary Specialty'],
+        color_discrete_map={
+            'Small': '#1cc88a',
+            'Medium': '#4e73df',
+            'Large': '#e74a3b',
+            'N/A': '#f6c23e'
+        },
+        zoom=3,
+        height=600
+    )
+
+    fig.update_layout(
+        map_style="open-street-map",
+        margin=dict(l=0, r=0, t=0, b=0)
+    )
+
+    return fig.to_dict()
+
+# The Summary figures only depend on the load-time counts, so build them once
+summary_size_figure = build_size_figure()
+summary_specialty_figure = build_specialty_figure()
+
 # Summary page content
 def render_summary_page():
     return html.Div([
@@ -277,17 +556,7 @@ def render_summary_page():
                                                    'borderBottom': '1px solid #ddd'}),
                 dcc.Graph(
                     id='size-chart',
-                    figure=px.bar(
-                        x=['Small', 'Medium', 'Large', 'N/A'],
-                        y=[small_count, medium_count, large_count, na_count],
-                        labels={'x': 'Size Category', 'y': 'Number of Hospitals'},
-                        color_discrete_sequence=['#4e73df', '#1cc88a', '#36b9cc', '#f6c23e']
-                    ).update_layout(
-                        margin=dict(l=40, r=40, t=40, b=40),
-                        paper_bgcolor='white',
-                        plot_bgcolor='white',
-                        height=400
-                    )
+                    figure=summary_size_figure
                 )
             ], style={'flex': '1', 'backgroundColor': 'white', 'borderRadius': '5px', 
                       'boxShadow': '0 2px 4px rgba(0,0,0,0.1)', 'margin': '0 10px', 
@@ -299,16 +568,7 @@ def render_summary_page():
                                                  'borderBottom': '1px solid #ddd'}),
                 dcc.Graph(
                     id='specialty-chart',
-                    figure=px.pie(
-                        values=list(top_specialties) + [other_count],
-                        names=list(top_specialties.index) + ['Other'],
-                        hole=0.4,
-                        color_discrete_sequence=['#4e73df', '#1cc88a', '#36b9cc', '#f6c23e', '#e74a3b', '#f8f9fa']
-                    ).update_layout(
-                        margin=dict(l=40, r=40, t=40, b=40),
-                        paper_bgcolor='white',
-                        height=400
-                    )
+                    figure=summary_specialty_figure
                 )
             ], style={'flex': '1', 'backgroundColor': 'white', 'borderRadius': '5px', 
                       'boxShadow': '0 2px 4px rgba(0,0,0,0.1)', 'margin': '0 10px', 
@@ -459,6 +719,8 @@ def render_companies_page():
                     id='company-search',
                     type='text',
                     placeholder='Search companies...',
+                    # Only send the query once typing pauses
+                    debounce=0.3,
                     style={
                         'width': '100%',
                         'padding': '10px 10px 10px 40px',
@@ -486,6 +748,57 @@ def render_companies_page():
         dcc.Store(id='filtered-hospitals', data=sample_hospitals)
     ])
 
+# Search result cache
+# Recent queries are kept in a TTL'd LRU, and an identical query that arrives
+# while the same search is running waits for that result (single-flight)
+# instead of rescanning df
+SEARCH_CACHE_SIZE = 256
+SEARCH_CACHE_TTL = int(os.environ.get('SEARCH_CACHE_TTL', '300'))  # seconds
+_search_cache = OrderedDict()
+_search_in_flight = {}
+_search_lock = threading.Lock()
+
+def search_hospitals(search_term):
+    # The term is matched as a regex, so key on it exactly: lower-casing would
+    # turn e.g. \W into \w and share results between different queries
+    key = search_term
+    
+    with _search_lock:
+        cached = _search_cache.get(key)
+        if cached is not None and time.monotonic() - cached[0] < SEARCH_CACHE_TTL:
+            _search_cache.move_to_end(key)
+            return cached[1]
+        
+        in_flight = _search_in_flight.get(key)
+        if in_flight is None:
+            in_flight = _search_in_flight[key] = Future()
+            leader = True
+        else:
+            leader = False
+    
+    if not leader:
+        return in_flight.result()
+    
+    try:
+        filtered = df[df['Hospital/Organization'].str.contains(search_term, case=False) | 
+                      df['Location'].str.contains(search_term, case=False) |
+                      df['Primary Specialty'].str.contains(search_term, case=False)]
+        result = filtered.head(8).to_dict('records')
+    except Exception as error:
+        with _search_lock:
+            del _search_in_flight[key]
+        in_flight.set_exception(error)
+        raise
+    
+    with _search_lock:
+        del _search_in_flight[key]
+        _search_cache[key] = (time.monotonic(), result)
+        _search_cache.move_to_end(key)
+        while len(_search_cache) > SEARCH_CACHE_SIZE:
+            _search_cache.popitem(last=False)
+    in_flight.set_result(result)
+    return result
+
 # Callback to filter companies based on search
 @app.callback(
     Output('filtered-hospitals', 'data'),
@@ -495,14 +808,12 @@ def filter_companies(search_term):
     if not search_term:
         return df.sample(min(8, len(df))).to_dict('records')
     
-    filtered = df[df['Hospital/Organization'].str.contains(search_term, case=False) | 
-                  df['Location'].str.contains(search_term, case=False) |
-                  df['Primary Specialty'].str.contains(search_term, case=False)]
+    filtered = search_hospitals(search_term)
     
     if len(filtered) == 0:
         return df.sample(min(8, len(df))).to_dict('records')
     
-    return filtered.head(8).to_dict('records')
+    return filtered
 
 # Map page content
 def render_map_page():
@@ -563,12 +874,8 @@ def render_map_page():
 
 # Analytics page content
 def render_analytics_page():
-    # Calculate additional analytics
-    beds_by_size = df.groupby('Size Category')['Estimated Beds'].mean().reset_index()
-    beds_by_size = beds_by_size.sort_values('Estimated Beds', ascending=False)
-    
-    top_locations = df['Location'].value_counts().head(10).reset_index()
-    top_locations.columns = ['Location', 'Count']
+    beds_figure = submit_figure(build_beds_by_size_figure)
+    locations_figure = submit_figure(build_top_locations_figure)
     
     return html.Div([
         html.H1('Analytics', style={'margin': '0 0 20px 0'}),
@@ -581,24 +888,7 @@ def render_analytics_page():
                 html.H3('Average Beds by Size Category', style={'padding': '15px', 'margin': '0', 
                                                               'borderBottom': '1px solid #ddd'}),
                 dcc.Graph(
-                    figure=px.bar(
-                        beds_by_size,
-                        x='Size Category',
-                        y='Estimated Beds',
-                        color='Size Category',
-                        labels={'Estimated Beds': 'Average Number of Beds'},
-                        color_discrete_map={
-                            'Small': '#1cc88a',
-                            'Medium': '#4e73df',
-                            'Large': '#e74a3b',
-                            'N/A': '#f6c23e'
-                        }
-                    ).update_layout(
-                        margin=dict(l=40, r=40, t=40, b=40),
-                        paper_bgcolor='white',
-                        plot_bgcolor='white',
-                        height=400
-                    )
+                    figure=beds_figure.result()
                 )
             ], style={'backgroundColor': 'white', 'borderRadius': '5px', 
                       'boxShadow': '0 2px 4px rgba(0,0,0,0.1)', 'marginBottom': '20px'}),
@@ -608,25 +898,68 @@ def render_analytics_page():
                 html.H3('Top 10 Hospital Locations', style={'padding': '15px', 'margin': '0', 
                                                           'borderBottom': '1px solid #ddd'}),
                 dcc.Graph(
-                    figure=px.bar(
-                        top_locations,
-                        x='Count',
-                        y='Location',
-                        orientation='h',
-                        color_discrete_sequence=['#4e73df']
-                    ).update_layout(
-                        margin=dict(l=40, r=40, t=40, b=40),
-                        paper_bgcolor='white',
-                        plot_bgcolor='white',
-                        height=400,
-                        yaxis={'categoryorder': 'total ascending'}
-                    )
+                    figure=locations_figure.result()
                 )
+            ], style={'backgroundColor': 'white', 'borderRadius': '5px', 
+                      'boxShadow': '0 2px 4px rgba(0,0,0,0.1)', 'marginBottom': '20px'}),
+            
+            # Drill-down by location, size and specialty
+            html.Div([
+                html.H3('Drill Down by Location', style={'padding': '15px', 'margin': '0', 
+                                                       'borderBottom': '1px solid #ddd'}),
+                
+                # Drill-down controls
+                html.Div([
+                    html.Div([
+                        html.Label('State:', style={'fontWeight': 'bold', 'marginRight': '10px'}),
+                        dcc.Dropdown(
+                            id='analytics-state-dropdown',
+                            options=[{'label': state, 'value': state} for state in unique_states],
+                            value=None,
+                            placeholder='All states',
+                            style={'width': '250px'}
+                        )
+                    ], style={'display': 'flex', 'alignItems': 'center', 'marginRight': '20px'}),
+                    
+                    html.Div([
+                        html.Label('Size:', style={'fontWeight': 'bold', 'marginRight': '10px'}),
+                        dcc.Dropdown(
+                            id='analytics-size-dropdown',
+                            options=[{'label': size, 'value': size} for size in unique_sizes],
+                            value=None,
+                            placeholder='All sizes',
+                            style={'width': '200px'}
+                        )
+                    ], style={'display': 'flex', 'alignItems': 'center'})
+                ], style={'display': 'flex', 'padding': '15px'}),
+                
+                # Drill-down charts
+                html.Div([
+                    html.Div([
+                        dcc.Graph(id='drilldown-location-chart')
+                    ], style={'flex': '1', 'minWidth': '45%'}),
+                    
+                    html.Div([
+                        dcc.Graph(id='drilldown-specialty-chart')
+                    ], style={'flex': '1', 'minWidth': '45%'})
+                ], style={'display': 'flex', 'flexWrap': 'wrap'})
             ], style={'backgroundColor': 'white', 'borderRadius': '5px', 
                       'boxShadow': '0 2px 4px rgba(0,0,0,0.1)'})
         ])
     ])
 
+# Callback to update the Analytics drill-down charts from the rollup cube
+@app.callback(
+    [Output('drilldown-location-chart', 'figure'),
+     Output('drilldown-specialty-chart', 'figure')],
+    [Input('analytics-state-dropdown', 'value'),
+     Input('analytics-size-dropdown', 'value')]
+)
+def update_drilldown(selected_state, selected_size):
+    location_figure = submit_figure(build_location_drilldown_figure, selected_state, selected_size)
+    specialty_figure = submit_figure(build_specialty_drilldown_figure, selected_state, selected_size)
+    return location_figure.result(), specialty_figure.result()
+
 # Table page content
 def render_table_page():
     return html.Div([
@@ -692,36 +1025,7 @@ def update_dropdown_state(filter_type):
      Input('specialty-dropdown', 'value')]
 )
 def update_map(filter_type, selected_size, selected_specialty):
-    filtered_df = df.copy()
-    
-    if filter_type == 'size' and selected_size:
-        filtered_df = filtered_df[filtered_df['Size Category'] == selected_size]
-    elif filter_type == 'specialty' and selected_specialty:
-        filtered_df = filtered_df[filtered_df['Primary Specialty'] == selected_specialty]
-    
-    fig = px.scatter_map(
-        filtered_df,
-        lat='Latitude',
-        lon='Longitude',
-        color='Size Category',
-        hover_name='Hospital/Organization',
-        hover_data=['Location', 'Estimated Beds', 'Primary Specialty'],
-        color_discrete_map={
-            'Small': '#1cc88a',
-            'Medium': '#4e73df',
-            'Large': '#e74a3b',
-            'N/A': '#f6c23e'
-        },
-        zoom=3,
-        height=600
-    )
-    
-    fig.update_layout(
-        mapbox_style="open-street-map",
-        margin=dict(l=0, r=0, t=0, b=0)
-    )
-    
-    return fig
+    return submit_figure(build_map_figure, filter_type, selected_size, selected_specialty).result()
 
 # Add Font Awesome for icons
 app.index_string = '''
@@ -747,6 +1051,19 @@ app.index_string = '''
 
 server = app.server
 
+# Health endpoint for the load balancer, with the startup timeline
+@server.route('/healthz')
+def healthz():
+    return {
+        'status': 'ok',
+        'pid': os.getpid(),
+        'startup': [{'phase': phase, 'seconds': seconds} for phase, seconds in startup_timeline]
+    }
+
+mark_startup('callbacks')
+print('Startup timeline: ' + ', '.join(f'{phase} {seconds:.2f}s' for phase, seconds in startup_timeline),
+      flush=True)
+
 # Run the app
 if __name__ == '__main__':
     app.run_server(debug=True)
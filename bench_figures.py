@@ -0,0 +1,43 @@
+# Concurrent-user benchmark for the figure-heavy callbacks.
+#
+# Simulates several users hitting the Summary, Analytics and Map pages at
+# the same time and reports pages per second. Run it once per rendering mode:
+#
+#   python bench_figures.py --users 8 --figure-workers 0
+#   python bench_figures.py --users 8 --figure-workers 4
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+parser = argparse.ArgumentParser()
+parser.add_argument('--users', type=int, default=8)
+parser.add_argument('--requests', type=int, default=10, help='page loads per user')
+parser.add_argument('--figure-workers', type=int, default=0)
+args = parser.parse_args()
+
+# FIGURE_WORKERS is read when app is imported
+os.environ['FIGURE_WORKERS'] = str(args.figure_workers)
+import app
+
+def simulate_user(user):
+    for i in range(args.requests):
+        page = i % 3
+        if page == 0:
+            app.render_summary_page()
+        elif page == 1:
+            app.render_analytics_page()
+        else:
+            app.update_map('size', app.unique_sizes[user % len(app.unique_sizes)], None)
+
+# Warm up so pool start-up isn't counted
+simulate_user(0)
+
+start = time.perf_counter()
+with ThreadPoolExecutor(max_workers=args.users) as pool:
+    list(pool.map(simulate_user, range(args.users)))
+elapsed = time.perf_counter() - start
+
+total = args.users * args.requests
+print(f'users={args.users} figure_workers={args.figure_workers} cpus={os.cpu_count()} '
+      f'pages={total} elapsed={elapsed:.2f}s throughput={total / elapsed:.1f} pages/s')
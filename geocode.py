@@ -0,0 +1,198 @@
+import argparse
+import csv
+import importlib
+import json
+import os
+import re
+import tempfile
+from functools import lru_cache
+
+# Coordinate enrichment
+# Fills missing Latitude/Longitude from Location. Lookups go through a
+# pluggable geocoder, are deduplicated by normalized location and persisted
+# in an on-disk cache, so re-ingesting a sheet makes no repeat lookups.
+# The cache keeps one section per geocoder, so switching geocoders looks
+# every location up again rather than reusing another geocoder's answers.
+# The bundled gazetteer is a local file, so its answers are never cached and
+# edits to gazetteer.csv take effect on the next run.
+#
+# Run it as a batch job before deploying a new sheet:
+#
+#   python geocode.py Complete_Hospital_Locations_and_Sizes.xlsx
+#
+# which writes Complete_Hospital_Locations_and_Sizes.enriched.xlsx and leaves
+# the input workbook untouched.
+
+GAZETTEER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gazetteer.csv')
+DEFAULT_CACHE_PATH = os.environ.get('GEOCODE_CACHE', 'geocode_cache.json')
+
+# Vague place names are looked up by the city they describe
+CITY_PREFIXES = ('GREATER ', 'METRO ')
+CITY_SUFFIXES = (' AND SUBURBS', ' AREA', ' REGION', ' COUNTY')
+
+# Load the bundled gazetteer as {(region, city): (lat, lon)}, where the
+# row with an empty city is the region's centroid
+@lru_cache(maxsize=None)
+def load_gazetteer(path=GAZETTEER_PATH):
+    with open(path, newline='') as gazetteer_file:
+        return {
+            (row['region'], row['city']): (float(row['latitude']), float(row['longitude']))
+            for row in csv.DictReader(gazetteer_file)
+        }
+
+@lru_cache(maxsize=None)
+def known_regions():
+    return frozenset(region for region, city in load_gazetteer())
+
+# Split 'STATE, CITY (COUNTRY)' into (region, city, country). Some rows are
+# written 'CITY, STATE (COUNTRY)', so the region is whichever part is a
+# known state or province. When both parts are regions (e.g. 'WASHINGTON,
+# DISTRICT OF COLUMBIA'), the order the gazetteer knows as region and city wins.
+def split_location(location):
+    if not isinstance(location, str) or not location.strip():
+        return 'N/A', '', ''
+    text = re.sub(r'\s+', ' ', location.strip().upper())
+
+    country = ''
+    match = re.match(r'^(.*?)\s*\(([^)]*)\)$', text)
+    if match:
+        text, country = match.group(1), match.group(2).strip()
+
+    parts = [part.strip() for part in text.split(',', 1)]
+    if len(parts) == 1:
+        return parts[0], '', country
+    first, second = parts
+    regions = known_regions()
+    if second in regions:
+        if first not in regions or (first, second) not in load_gazetteer():
+            return second, first, country
+    return first, second, country
+
+# Cache key for a location: 'REGION, CITY (COUNTRY)' with the parts in a
+# fixed order and case, so spelling variants share one entry
+def normalize_location(location):
+    region, city, country = split_location(location)
+    key = f'{region}, {city}' if city else region
+    return f'{key} ({country})' if country else key
+
+# Default geocoder: resolve a batch of normalized locations against the
+# bundled gazetteer, falling back to the region centroid for place names it
+# doesn't know. A geocoder takes a list of normalized locations and returns
+# {location: (lat, lon)} for the ones it could resolve.
+def gazetteer_geocoder(locations):
+    gazetteer = load_gazetteer()
+    results = {}
+    for location in locations:
+        region, city, country = split_location(location)
+
+        candidates = [city]
+        for prefix in CITY_PREFIXES:
+            if city.startswith(prefix):
+                candidates.append(city[len(prefix):])
+        for candidate in list(candidates):
+            for suffix in CITY_SUFFIXES:
+                if candidate.endswith(suffix):
+                    candidates.append(candidate[:-len(suffix)])
+        candidates.append('')
+
+        for candidate in candidates:
+            if (region, candidate) in gazetteer:
+                results[location] = gazetteer[(region, candidate)]
+                break
+    return results
+
+# Load a geocoder given as 'module:function'
+def load_geocoder(spec):
+    module_name, function_name = spec.split(':')
+    return getattr(importlib.import_module(module_name), function_name)
+
+# Load the cache as {geocoder name: {location: (lat, lon) or None}}
+def load_cache(cache_path):
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    with open(cache_path) as cache_file:
+        return {
+            name: {key: tuple(value) if value else None for key, value in entries.items()}
+            for name, entries in json.load(cache_file).items()
+            if isinstance(entries, dict)
+        }
+
+def save_cache(cache, cache_path):
+    # Write to a uniquely named temporary file first, so an interrupted run
+    # can't corrupt the cache and concurrent writers don't share a temp file
+    descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or '.',
+                                             prefix='.geocode_cache.', suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w') as cache_file:
+            json.dump(cache, cache_file, indent=1, sort_keys=True)
+        os.replace(temp_path, cache_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+# Fill missing Latitude/Longitude in df in place and return lookup stats.
+# geocoder_name selects the geocoder's section of the cache; cache_path=None
+# disables the on-disk cache.
+def enrich_coordinates(df, geocoder=gazetteer_geocoder, geocoder_name='gazetteer',
+                       cache_path=DEFAULT_CACHE_PATH, batch_size=100):
+    missing = df['Latitude'].isna() | df['Longitude'].isna()
+    stats = {'missing_rows': int(missing.sum()), 'filled_rows': 0,
+             'unique_locations': 0, 'cache_hits': 0, 'lookups': 0}
+    if not missing.any():
+        return stats
+
+    # Normalize each distinct Location string once, not once per row
+    raw_locations = df.loc[missing, 'Location'].dropna().unique()
+    normalized = {location: normalize_location(location) for location in raw_locations}
+    unique_keys = sorted(set(normalized.values()))
+    stats['unique_locations'] = len(unique_keys)
+
+    if geocoder is gazetteer_geocoder:
+        cache_path = None
+    cache = load_cache(cache_path)
+    answers = cache.setdefault(geocoder_name, {})
+    pending = [key for key in unique_keys if key not in answers]
+    stats['cache_hits'] = len(unique_keys) - len(pending)
+
+    for start in range(0, len(pending), batch_size):
+        batch = pending[start:start + batch_size]
+        results = geocoder(batch)
+        stats['lookups'] += len(batch)
+        # Misses are cached too, so this geocoder doesn't retry locations it
+        # couldn't resolve; other geocoders still get to try them
+        for key in batch:
+            answers[key] = results.get(key)
+        if cache_path:
+            # A read-only cache location shouldn't stop enrichment (or app startup)
+            try:
+                save_cache(cache, cache_path)
+            except OSError as error:
+                print(f'Could not save geocode cache to {cache_path}: {error}', flush=True)
+
+    coordinates = df.loc[missing, 'Location'].map(lambda location: answers.get(normalized.get(location)))
+    resolved = coordinates.dropna()
+    df.loc[resolved.index, 'Latitude'] = [lat for lat, lon in resolved]
+    df.loc[resolved.index, 'Longitude'] = [lon for lat, lon in resolved]
+    stats['filled_rows'] = len(resolved)
+    return stats
+
+if __name__ == '__main__':
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description='Fill missing hospital coordinates from Location.')
+    parser.add_argument('input', help='workbook to enrich')
+    parser.add_argument('--output', help='where to write the enriched workbook (default: <input>.enriched.xlsx)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='on-disk geocode cache')
+    parser.add_argument('--geocoder', help="custom geocoder as 'module:function'")
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    df = pd.read_excel(args.input)
+    geocoder = load_geocoder(args.geocoder) if args.geocoder else gazetteer_geocoder
+    stats = enrich_coordinates(df, geocoder=geocoder, geocoder_name=args.geocoder or 'gazetteer',
+                               cache_path=args.cache, batch_size=args.batch_size)
+    output = args.output or os.path.splitext(args.input)[0] + '.enriched.xlsx'
+    df.to_excel(output, index=False)
+
+    print(f'Wrote {output}: ' + ', '.join(f'{name}={value}' for name, value in stats.items()))
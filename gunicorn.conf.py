@@ -0,0 +1,18 @@
+import os
+
+# Worker processes and threads per worker. Threads let one worker accept
+# several users at once while their figures are built in the figure pool
+# (see FIGURE_WORKERS in app.py).
+workers = int(os.environ.get('WEB_CONCURRENCY', '1'))
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+# Load app.py (imports, workbook, layout) once in the master so workers
+# inherit it through copy-on-write instead of each loading it again
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Start the figure pool once the worker has loaded the app, while it is still
+# single-threaded, so the pool processes are never forked from a request thread
+def post_worker_init(worker):
+    import app
+    if app.FIGURE_WORKERS > 0:
+        app.get_figure_pool()
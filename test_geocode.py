@@ -0,0 +1,127 @@
+import os
+
+import pandas as pd
+import pytest
+
+import geocode
+
+SHEET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          'Complete_Hospital_Locations_and_Sizes.xlsx')
+
+# A stand-in for a network geocoder: answers from the gazetteer and records
+# every batch it is asked for
+class CountingGeocoder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, locations):
+        self.batches.append(list(locations))
+        return geocode.gazetteer_geocoder(locations)
+
+    @property
+    def lookups(self):
+        return sum(len(batch) for batch in self.batches)
+
+def blank_sheet(locations):
+    return pd.DataFrame({'Location': locations,
+                         'Latitude': [None] * len(locations),
+                         'Longitude': [None] * len(locations)})
+
+@pytest.mark.parametrize('location, expected', [
+    ('TEXAS, AUSTIN (USA)', 'TEXAS, AUSTIN (USA)'),
+    ('AUSTIN, TEXAS (USA)', 'TEXAS, AUSTIN (USA)'),
+    ('  austin ,  texas  (usa)', 'TEXAS, AUSTIN (USA)'),
+    ('WASHINGTON, DISTRICT OF COLUMBIA (USA)', 'DISTRICT OF COLUMBIA, WASHINGTON (USA)'),
+    ('WASHINGTON, SEATTLE (USA)', 'WASHINGTON, SEATTLE (USA)'),
+    ('ONTARIO', 'ONTARIO'),
+])
+def test_normalize_location(location, expected):
+    assert geocode.normalize_location(location) == expected
+
+def test_split_location_handles_missing_values():
+    assert geocode.split_location(None) == ('N/A', '', '')
+    assert geocode.split_location('  ') == ('N/A', '', '')
+
+@pytest.mark.parametrize('location, expected', [
+    ('TEXAS, GREATER DALLAS AREA (USA)', (32.78, -96.80)),
+    ('LOUISIANA, GREATER NEW ORLEANS (USA)', (29.95, -90.07)),
+    ('CALIFORNIA, SAN DIEGO REGION (USA)', (32.72, -117.16)),
+    ('CALIFORNIA, SANTA CLARA COUNTY (USA)', (37.35, -121.96)),
+    ('PENNSYLVANIA, NORTH PHILADELPHIA AND SUBURBS (USA)', (40.00, -75.15)),
+    # Unknown place names fall back to the region centroid
+    ('CALIFORNIA, SOUTHERN AREA (USA)', (36.12, -119.68)),
+])
+def test_gazetteer_prefix_and_suffix_fallbacks(location, expected):
+    assert geocode.gazetteer_geocoder([location]) == {location: expected}
+
+def test_gazetteer_skips_unknown_regions():
+    assert geocode.gazetteer_geocoder(['ATLANTIS, CAPITAL']) == {}
+
+def test_every_sheet_location_resolves():
+    sheet = pd.read_excel(SHEET_PATH)
+    locations = sorted({geocode.normalize_location(location) for location in sheet['Location']})
+    assert len(locations) == 192
+    assert set(geocode.gazetteer_geocoder(locations)) == set(locations)
+
+def test_second_run_makes_no_lookups(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    sheet = pd.read_excel(SHEET_PATH)
+    sheet[['Latitude', 'Longitude']] = None
+    geocoder = CountingGeocoder()
+
+    first = sheet.copy()
+    stats = geocode.enrich_coordinates(first, geocoder=geocoder, geocoder_name='counting',
+                                       cache_path=cache_path, batch_size=50)
+    assert stats['unique_locations'] == 192
+    assert stats['lookups'] == geocoder.lookups == 192
+    assert max(len(batch) for batch in geocoder.batches) == 50
+    assert first['Latitude'].notna().all()
+
+    second = sheet.copy()
+    stats = geocode.enrich_coordinates(second, geocoder=geocoder, geocoder_name='counting',
+                                       cache_path=cache_path)
+    assert stats['lookups'] == 0
+    assert stats['cache_hits'] == 192
+    assert geocoder.lookups == 192
+    pd.testing.assert_frame_equal(first, second)
+
+def test_cache_sections_are_per_geocoder(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    first, second = CountingGeocoder(), CountingGeocoder()
+
+    geocode.enrich_coordinates(blank_sheet(['OHIO, AKRON (USA)']), geocoder=first,
+                               geocoder_name='first', cache_path=cache_path)
+    stats = geocode.enrich_coordinates(blank_sheet(['AKRON, OHIO (USA)']), geocoder=second,
+                                       geocoder_name='second', cache_path=cache_path)
+
+    assert stats['lookups'] == 1
+    assert second.batches == [['OHIO, AKRON (USA)']]
+    assert set(geocode.load_cache(cache_path)) == {'first', 'second'}
+
+def test_misses_are_cached_per_geocoder(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    geocoder = CountingGeocoder()
+    sheet = blank_sheet(['ATLANTIS, CAPITAL'])
+
+    for _ in range(2):
+        stats = geocode.enrich_coordinates(sheet, geocoder=geocoder, geocoder_name='counting',
+                                           cache_path=cache_path)
+        assert stats['filled_rows'] == 0
+    assert geocoder.lookups == 1
+    assert geocode.load_cache(cache_path) == {'counting': {'ATLANTIS, CAPITAL': None}}
+
+def test_gazetteer_answers_are_not_cached(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    sheet = blank_sheet(['OHIO, AKRON (USA)'])
+
+    stats = geocode.enrich_coordinates(sheet, cache_path=cache_path)
+
+    assert stats['filled_rows'] == 1
+    assert sheet.loc[0, ['Latitude', 'Longitude']].tolist() == [41.08, -81.52]
+    assert not os.path.exists(cache_path)
+
+def test_unwritable_cache_does_not_stop_enrichment(tmp_path):
+    sheet = blank_sheet(['OHIO, AKRON (USA)'])
+    stats = geocode.enrich_coordinates(sheet, geocoder=CountingGeocoder(), geocoder_name='counting',
+                                       cache_path=str(tmp_path / 'missing' / 'cache.json'))
+    assert stats['filled_rows'] == 1